@@ -1,12 +1,268 @@
 """Tool for batch appending data in Google Sheets."""
 
 from collections.abc import Generator
+from functools import partial
 from typing import Any
+import io
 import json
+import re
+import time
+import ijson
 from dify_plugin import Tool
 from dify_plugin.entities.tool import ToolInvokeMessage
 
-from .utils.google_service import get_sheets_service, handle_google_api_error
+from .utils.google_service import (
+    SHEETS_API_BASE,
+    execute_concurrently,
+    execute_with_retry,
+    get_sheets_session,
+    handle_google_api_error,
+)
+
+
+# Payloads at least this large are parsed incrementally with ijson; below
+# it, json.loads is faster because ijson's startup cost dominates.
+_STREAM_PARSE_THRESHOLD = 64 * 1024
+
+# Quoted sheet name in an A1-notation range, where '' is an escaped quote
+# inside the name (e.g. "'Sheet 1'!A1", "'It''s'!A1"), followed by an
+# optional !cell-reference part
+_QUOTED_SHEET_RE = re.compile(r"^'((?:[^']|'')+)'(?:!.*)?$")
+
+
+def _sheet_name(range_str: str) -> str:
+    """Extract the sheet name from an A1-notation range.
+
+    Args:
+        range_str: A range such as "Sheet1!A1:B2", "'It''s'!A1" or "Sheet1"
+
+    Returns:
+        The sheet name, unquoted and with '' escapes collapsed to '
+    """
+    match = _QUOTED_SHEET_RE.match(range_str)
+    if match:
+        return match.group(1).replace("''", "'")
+
+    # Unquoted names cannot contain '!', so everything before it is the name
+    return range_str.split("!", 1)[0]
+
+
+def _to_extended_value(cell: Any, value_input_option: str) -> dict[str, Any]:
+    """Convert a scalar cell value to a Sheets ExtendedValue object.
+
+    Unlike the values endpoints, updateCells takes typed values, so
+    USER_ENTERED here only covers formula detection: strings starting with
+    '=' become formulas, but numeric/date/boolean-looking strings (e.g.
+    "42", "2024-01-01", "TRUE") are written as literal text rather than
+    coerced the way values.update would.
+
+    Args:
+        cell: The cell value (bool, number, string or None)
+        value_input_option: The tool's value input option; with USER_ENTERED,
+            strings starting with '=' are treated as formulas
+
+    Returns:
+        An ExtendedValue dict usable in updateCells requests
+    """
+    if isinstance(cell, bool):
+        return {"boolValue": cell}
+    if isinstance(cell, (int, float)):
+        return {"numberValue": cell}
+
+    cell = "" if cell is None else str(cell)
+    if value_input_option == "USER_ENTERED" and cell.startswith("="):
+        return {"formulaValue": cell}
+    return {"stringValue": cell}
+
+
+# Cache of spreadsheet metadata (title -> sheetId maps) keyed by spreadsheet
+# ID, so repeated invocations against the same spreadsheet skip the
+# spreadsheets.get round-trip while the entry is fresh.
+_META_CACHE: dict[str, tuple[float, dict[str, int]]] = {}
+_META_CACHE_TTL = 60.0
+
+
+def _get_sheet_map(session: Any, spreadsheet_id: str) -> dict[str, int]:
+    """Return a mapping of sheet title to sheetId for a spreadsheet.
+
+    Results are cached for a short TTL; callers that create sheets should
+    update the returned dict in place so the cache stays consistent.
+
+    Args:
+        session: An authorized requests session for the Sheets API
+        spreadsheet_id: The ID of the spreadsheet
+
+    Returns:
+        A dict mapping each sheet's title to its sheetId
+    """
+    cached = _META_CACHE.get(spreadsheet_id)
+    if cached is not None and time.monotonic() - cached[0] < _META_CACHE_TTL:
+        return cached[1]
+
+    # Only titles and sheetIds are needed, so mask out the rest of the
+    # spreadsheet object (grid properties, formats, etc.).
+    def _do() -> dict:
+        response = session.get(
+            f"{SHEETS_API_BASE}/{spreadsheet_id}",
+            params={"fields": "sheets.properties(title,sheetId)"},
+        )
+        response.raise_for_status()
+        return response.json()
+
+    spreadsheet = execute_with_retry(_do)
+    sheet_map = {
+        sheet["properties"]["title"]: sheet["properties"]["sheetId"]
+        for sheet in spreadsheet.get("sheets", [])
+    }
+    _META_CACHE[spreadsheet_id] = (time.monotonic(), sheet_map)
+    return sheet_map
+
+
+def _build_first_row_plan(
+    first_row_items: list,
+    sheet_map: dict[str, int],
+    value_input_option: str,
+    include_values_in_response: bool,
+) -> tuple[list, list]:
+    """Build the batchUpdate subrequests for first_row items.
+
+    Merges every first_row item into the fewest subrequests: one
+    insertDimension plus one updateCells per target sheet. In the old
+    per-item flow each later item pushed earlier rows down, so within a
+    sheet the merged block holds the items' rows in reverse item order.
+
+    updateCells replies carry no cell data, so when
+    include_values_in_response is set the written values are echoed into
+    each result's updatedData instead; the response render options cannot
+    apply to first_row items.
+
+    Args:
+        first_row_items: (sheet_name, item) pairs to insert at the top
+        sheet_map: Mapping of sheet title to sheetId
+        value_input_option: The tool's value input option
+        include_values_in_response: Whether to echo the written values into
+            the per-item results
+
+    Returns:
+        A (subrequests, results) tuple: the batchUpdate requests array and
+        the per-item result summaries in item order
+    """
+    merged_values: dict[str, list] = {}
+    for sheet_name, item in first_row_items:
+        values = item["values"]
+        if values:
+            merged_values[sheet_name] = values + merged_values.get(sheet_name, [])
+
+    # Work out where each item lands in the merged layout so the per-item
+    # results still report a usable range anchor.
+    start_row: dict[str, int] = {}
+    anchor_rows = []
+    for sheet_name, item in reversed(first_row_items):
+        num_rows = len(item["values"])
+        if num_rows == 0:
+            anchor_rows.append(None)
+            continue
+        row = start_row.get(sheet_name, 1)
+        anchor_rows.append(row)
+        start_row[sheet_name] = row + num_rows
+    anchor_rows.reverse()
+
+    results = []
+    for (sheet_name, item), anchor in zip(first_row_items, anchor_rows):
+        if anchor is None:
+            # Nothing to append, but keeping format consistent
+            results.append({"status": "no_op", "message": "Empty values list"})
+        else:
+            values = item["values"]
+            result = {
+                "updatedRange": f"'{sheet_name}'!A{anchor}",
+                "updatedRows": len(values),
+            }
+            if include_values_in_response:
+                result["updatedData"] = {
+                    "range": result["updatedRange"],
+                    "values": values,
+                }
+            results.append(result)
+
+    requests = []
+    for sheet_name, values in merged_values.items():
+        sheet_id = sheet_map[sheet_name]
+        rows = [
+            {
+                "values": [
+                    {"userEnteredValue": _to_extended_value(cell, value_input_option)}
+                    for cell in row
+                ]
+            }
+            for row in values
+        ]
+        requests.append(
+            {
+                "insertDimension": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "dimension": "ROWS",
+                        "startIndex": 0,
+                        "endIndex": len(values),
+                    },
+                    "inheritFromBefore": False,
+                }
+            }
+        )
+        requests.append(
+            {
+                "updateCells": {
+                    "start": {
+                        "sheetId": sheet_id,
+                        "rowIndex": 0,
+                        "columnIndex": 0,
+                    },
+                    "rows": rows,
+                    "fields": "userEnteredValue",
+                }
+            }
+        )
+
+    return requests, results
+
+
+def _resolve_next_rows(
+    session: Any, spreadsheet_id: str, sheet_names: list[str]
+) -> dict[str, int]:
+    """Resolve the first empty row of each named sheet.
+
+    values.batchUpdate writes starting at its range, so appends need an
+    explicit anchor below the existing data. One values.batchGet of column A
+    covers every sheet in a single round-trip.
+
+    Args:
+        session: An authorized requests session for the Sheets API
+        spreadsheet_id: The ID of the spreadsheet
+        sheet_names: The sheets whose next empty row is needed
+
+    Returns:
+        A dict mapping each sheet name to its 1-based next empty row
+    """
+    def _do() -> dict:
+        response = session.get(
+            f"{SHEETS_API_BASE}/{spreadsheet_id}/values:batchGet",
+            params={
+                "ranges": [f"'{name}'!A:A" for name in sheet_names],
+                "majorDimension": "COLUMNS",
+                "fields": "valueRanges.values",
+            },
+        )
+        response.raise_for_status()
+        return response.json()
+
+    value_ranges = execute_with_retry(_do).get("valueRanges", [])
+
+    next_rows = {}
+    for name, value_range in zip(sheet_names, value_ranges):
+        columns = value_range.get("values", [])
+        next_rows[name] = (len(columns[0]) if columns else 0) + 1
+    return next_rows
 
 
 class BatchAppendTool(Tool):
@@ -21,10 +277,14 @@ class BatchAppendTool(Tool):
                 data: A list of objects, each containing 'range' and 'values' keys
                       (either as a JSON string or already parsed)
                 value_input_option: How the input data should be interpreted
+                    (on first_row, USER_ENTERED only applies formula detection;
+                    other strings are written as literal text)
                 insert_data_option: How the input data should be inserted.
                 include_values_in_response: Whether to include the values in the response
                 response_value_render_option: How the values in the response should be rendered
+                    (last_row only; first_row results echo the written values as-is)
                 response_date_time_render_option: How dates, times, and durations in the response should be rendered
+                    (last_row only; first_row results echo the written values as-is)
                 append_position: Where to append the data ('last_row' or 'first_row')
 
         Yields:
@@ -55,19 +315,43 @@ class BatchAppendTool(Tool):
 
         try:
             # Parse data if it's a string
+            streaming = False
             if isinstance(data_param, str):
-                try:
-                    data = json.loads(data_param)
-                except json.JSONDecodeError:
-                    yield self.create_text_message(
-                        "Invalid JSON format for data. Please provide a valid JSON array."
+                if len(data_param) >= _STREAM_PARSE_THRESHOLD:
+                    # ijson yields nothing, rather than erroring, for valid
+                    # JSON that isn't an array — reject those up front the
+                    # way the eager path's isinstance check does
+                    first_char = next(
+                        (ch for ch in data_param if not ch.isspace()), ""
                     )
-                    return
+                    if first_char != "[":
+                        yield self.create_text_message(
+                            "Data must be a list of objects, each with 'range' and 'values' keys"
+                        )
+                        return
+
+                    # Parse large payloads incrementally so items are
+                    # validated in the same pass that consumes them, instead
+                    # of materializing the whole array twice. use_float keeps
+                    # non-integer numbers as floats like json.loads does;
+                    # ijson's default Decimal is not JSON serializable.
+                    data = ijson.items(
+                        io.StringIO(data_param), "item", use_float=True
+                    )
+                    streaming = True
+                else:
+                    try:
+                        data = json.loads(data_param)
+                    except json.JSONDecodeError:
+                        yield self.create_text_message(
+                            "Invalid JSON format for data. Please provide a valid JSON array."
+                        )
+                        return
             else:
                 data = data_param
 
             # Validate data format
-            if not isinstance(data, list):
+            if not streaming and not isinstance(data, list):
                 yield self.create_text_message(
                     "Data must be a list of objects, each with 'range' and 'values' keys"
                 )
@@ -75,146 +359,209 @@ class BatchAppendTool(Tool):
 
             # Get credentials from provider
             creds = self.runtime.credentials.get("credentials_json")
-            creds_json = json.loads(creds)
-
-            # Build service
-            service = get_sheets_service(creds_json)
-
-            # Get all existing sheet titles and IDs
-            spreadsheet = (
-                service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-            )
-            sheet_map = {
-                sheet["properties"]["title"]: sheet["properties"]["sheetId"]
-                for sheet in spreadsheet.get("sheets", [])
-            }
 
-            responses = []
+            # Authorized session against the Sheets REST endpoints (memoized
+            # per credential payload, pooled connections)
+            session = get_sheets_session(creds)
 
-            # Process the data items
-            for item in data:
-                if "range" not in item or "values" not in item:
-                    yield self.create_text_message(
-                        "Each data item must contain 'range' and 'values' keys"
+            def _post(path: str, payload: dict, params: dict | None = None) -> dict:
+                def _do() -> dict:
+                    response = session.post(
+                        f"{SHEETS_API_BASE}/{spreadsheet_id}{path}",
+                        json=payload,
+                        params=params,
                     )
-                    return
+                    response.raise_for_status()
+                    return response.json()
 
-                range_str = item["range"]
-                # extract sheet name from range
-                if "!" in range_str:
-                    sheet_name = range_str.split("!", 1)[0]
-                else:
-                    sheet_name = range_str
-
-                # Remove single quotes if present (e.g. 'Sheet 1'!A1)
-                if sheet_name.startswith("'") and sheet_name.endswith("'"):
-                    sheet_name = sheet_name[1:-1]
-
-                # Create sheet if it doesn't exist
-                if sheet_name not in sheet_map:
-                    # Create the sheet
-                    body = {
-                        "requests": [
-                            {"addSheet": {"properties": {"title": sheet_name}}}
-                        ]
-                    }
-                    result = (
-                        service.spreadsheets()
-                        .batchUpdate(spreadsheetId=spreadsheet_id, body=body)
-                        .execute()
-                    )
+                return execute_with_retry(_do)
 
-                    # Add new sheet to map
-                    new_sheet_props = result["replies"][0]["addSheet"]["properties"]
-                    sheet_map[new_sheet_props["title"]] = new_sheet_props["sheetId"]
+            # Get all existing sheet titles and IDs (cached with a short TTL)
+            sheet_map = _get_sheet_map(session, spreadsheet_id)
 
-                if append_position == "first_row":
-                    # Logic to insert at the top
-                    sheet_id = sheet_map[sheet_name]
-                    values = item["values"]
-                    num_rows = len(values)
-
-                    if num_rows > 0:
-                        # 1. Insert rows at index 0
-                        requests = [
-                            {
-                                "insertDimension": {
-                                    "range": {
-                                        "sheetId": sheet_id,
-                                        "dimension": "ROWS",
-                                        "startIndex": 0,
-                                        "endIndex": num_rows,
-                                    },
-                                    "inheritFromBefore": False,
-                                }
-                            }
-                        ]
-                        service.spreadsheets().batchUpdate(
-                            spreadsheetId=spreadsheet_id, body={"requests": requests}
-                        ).execute()
-
-                        # 2. Update the values in the newly created rows
-                        update_range = f"'{sheet_name}'!A1"
-                        body = {"values": values}
-
-                        kwargs = {
-                            "spreadsheetId": spreadsheet_id,
-                            "range": update_range,
-                            "valueInputOption": value_input_option,
-                            "includeValuesInResponse": include_values_in_response,
-                            "body": body,
-                        }
+            # Options shared by every value-write body, computed once instead
+            # of rebuilt (and re-checked) per request
+            common_body = {
+                "valueInputOption": value_input_option,
+                "includeValuesInResponse": include_values_in_response,
+            }
 
-                        if response_value_render_option:
-                            kwargs["responseValueRenderOption"] = (
-                                response_value_render_option
-                            )
+            if response_value_render_option:
+                common_body["responseValueRenderOption"] = (
+                    response_value_render_option
+                )
 
-                        if response_date_time_render_option:
-                            kwargs["responseDateTimeRenderOption"] = (
-                                response_date_time_render_option
-                            )
+            if response_date_time_render_option:
+                common_body["responseDateTimeRenderOption"] = (
+                    response_date_time_render_option
+                )
 
-                        result = (
-                            service.spreadsheets().values().update(**kwargs).execute()
+            # The invocation runs as a leveled pipeline: one planning pass
+            # over the items, then one batched API call per level — create
+            # missing sheets, insert/write first_row blocks, write appends —
+            # so the number of serialization fences stays constant no matter
+            # how many items arrive.
+
+            # Planning pass: validate the items and partition them. Plain
+            # appends can be coalesced into a single batchUpdate call, while
+            # first_row items need dimension inserts per sheet.
+            append_items = []
+            first_row_items = []
+            missing_names = []
+
+            # Set-based membership so large batches hitting the same few
+            # sheets do one cheap lookup per item
+            seen_sheets = set(sheet_map)
+
+            try:
+                for item in data:
+                    if "range" not in item or "values" not in item:
+                        yield self.create_text_message(
+                            "Each data item must contain 'range' and 'values' keys"
                         )
-                        responses.append(result)
+                        return
+
+                    sheet_name = _sheet_name(item["range"])
+
+                    if sheet_name not in seen_sheets:
+                        seen_sheets.add(sheet_name)
+                        missing_names.append(sheet_name)
+
+                    if append_position == "first_row":
+                        first_row_items.append((sheet_name, item))
                     else:
-                        # Nothing to append, but keeping format consistent
-                        responses.append(
-                            {"status": "no_op", "message": "Empty values list"}
-                        )
+                        append_items.append((sheet_name, item))
+            except ijson.JSONError:
+                # The streaming parser surfaces malformed JSON mid-iteration
+                yield self.create_text_message(
+                    "Invalid JSON format for data. Please provide a valid JSON array."
+                )
+                return
 
-                else:
-                    # Default: Append to the end
-                    body = {"values": item["values"]}
+            # Level 0: create all missing sheets with a single batchUpdate
+            # call instead of one round-trip per sheet. Later levels depend
+            # on the sheetIds this returns.
+            if missing_names:
+                body = {
+                    "requests": [
+                        {"addSheet": {"properties": {"title": name}}}
+                        for name in missing_names
+                    ]
+                }
+                result = _post(":batchUpdate", body)
+
+                # Add the new sheets to the map
+                for reply in result["replies"]:
+                    new_sheet_props = reply["addSheet"]["properties"]
+                    sheet_map[new_sheet_props["title"]] = new_sheet_props["sheetId"]
 
-                    kwargs = {
-                        "spreadsheetId": spreadsheet_id,
-                        "range": item["range"],
-                        "valueInputOption": value_input_option,
-                        "insertDataOption": "INSERT_ROWS",
-                        "includeValuesInResponse": include_values_in_response,
-                        "body": body,
-                    }
+            # Prepared (not yet dispatched) write calls. append_position
+            # applies to every item, so today exactly one of the first_row
+            # and last_row writes is built and this list never holds more
+            # than one call; the concurrent dispatch below only engages its
+            # pool if a future change prepares multiple independent writes.
+            prepared_calls = []
+
+            # Levels 1 and 2 for first_row items: the row inserts and the
+            # cell writes travel as ordered subrequests of one batchUpdate,
+            # so both levels cost a single call.
+            first_row_requests, first_row_results = _build_first_row_plan(
+                first_row_items,
+                sheet_map,
+                value_input_option,
+                include_values_in_response,
+            )
 
-                    if response_value_render_option:
-                        kwargs["responseValueRenderOption"] = (
-                            response_value_render_option
-                        )
+            if first_row_requests:
+                # insertDimension/updateCells replies carry no data, so
+                # only the spreadsheet ID needs to come back
+                prepared_calls.append(
+                    partial(
+                        _post,
+                        ":batchUpdate",
+                        {"requests": first_row_requests},
+                        {"fields": "spreadsheetId"},
+                    )
+                )
 
-                    if response_date_time_render_option:
-                        kwargs["responseDateTimeRenderOption"] = (
-                            response_date_time_render_option
+            # Level 2 for plain appends: one values.batchUpdate carrying
+            # every item.
+            if append_items:
+                # values.batchUpdate writes starting at the given range, so
+                # resolve the next empty row of each target sheet first to
+                # keep append semantics instead of overwriting existing data.
+                append_sheets = []
+                seen_append = set()
+                for sheet_name, _ in append_items:
+                    if sheet_name not in seen_append:
+                        seen_append.add(sheet_name)
+                        append_sheets.append(sheet_name)
+
+                next_row = _resolve_next_rows(session, spreadsheet_id, append_sheets)
+
+                # Rewrite each item's range to the resolved anchor and issue
+                # all appends as a single batchUpdate call.
+                batch_data = []
+                for sheet_name, item in append_items:
+                    values = item["values"]
+                    batch_data.append(
+                        {
+                            "range": f"'{sheet_name}'!A{next_row[sheet_name]}",
+                            "values": values,
+                        }
+                    )
+                    next_row[sheet_name] += len(values)
+
+                body = {**common_body, "data": batch_data}
+
+                batch_params = None
+                if not include_values_in_response:
+                    # Only the update summary is needed when the caller didn't
+                    # ask for the written values back
+                    batch_params = {
+                        "fields": (
+                            "spreadsheetId,responses(updatedRange,updatedRows,"
+                            "updatedColumns,updatedCells)"
                         )
+                    }
 
-                    result = service.spreadsheets().values().append(**kwargs).execute()
-                    responses.append(result)
+                prepared_calls.append(
+                    partial(_post, "/values:batchUpdate", body, batch_params)
+                )
 
-            # Return result
-            yield self.create_json_message(
-                {"spreadsheetId": spreadsheet_id, "responses": responses}
-            )
+            # Execute the prepared writes (currently always a single call,
+            # which execute_concurrently runs inline without a pool)
+            results = execute_concurrently(prepared_calls)
+
+            if append_items:
+                append_results = results[-1].get("responses", [])
+            else:
+                append_results = []
+
+            # A valid empty data array still gets an explicit message, so
+            # consumers can tell "nothing to do" from a tool that failed to
+            # produce output.
+            if not first_row_results and not append_results:
+                yield self.create_json_message(
+                    {
+                        "spreadsheetId": spreadsheet_id,
+                        "status": "no_op",
+                        "message": "Empty data list",
+                    }
+                )
+                return
+
+            # Stream one message per result instead of accumulating them all
+            # into a single giant payload, so the caller can consume results
+            # incrementally and dispatched replies become collectable.
+            for index, result in enumerate(first_row_results + append_results):
+                yield self.create_json_message(
+                    {
+                        "spreadsheetId": spreadsheet_id,
+                        "index": index,
+                        "response": result,
+                    }
+                )
 
         except Exception as e:
             error_message = handle_google_api_error(e)
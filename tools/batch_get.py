@@ -60,10 +60,9 @@ class BatchGetTool(Tool):
             
             # Get credentials
             creds = self.runtime.credentials.get('credentials_json')
-            creds_json = json.loads(creds)
-            
-            # Build service
-            service = get_sheets_service(creds_json)
+
+            # Build service (memoized per credential payload)
+            service = get_sheets_service(creds)
             
             # Prepare parameters for batch get
             params = {
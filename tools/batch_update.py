@@ -62,10 +62,9 @@ class BatchUpdateTool(Tool):
             
             # Get credentials from provider
             creds = self.runtime.credentials.get('credentials_json')
-            creds_json = json.loads(creds)
-            
-            # Build service
-            service = get_sheets_service(creds_json)
+
+            # Build service (memoized per credential payload)
+            service = get_sheets_service(creds)
             
             # Prepare data for batch update
             batch_update_values_request_body = {
@@ -1,8 +1,21 @@
 """Utilities for Google Sheets tools."""
 
-from .google_service import get_sheets_service, handle_google_api_error
+from .google_service import (
+    SHEETS_API_BASE,
+    execute_concurrently,
+    execute_with_retry,
+    get_credentials,
+    get_sheets_service,
+    get_sheets_session,
+    handle_google_api_error,
+)
 
 __all__ = [
+    'SHEETS_API_BASE',
+    'execute_concurrently',
+    'execute_with_retry',
+    'get_credentials',
     'get_sheets_service',
+    'get_sheets_session',
     'handle_google_api_error'
 ] 
\ No newline at end of file
@@ -1,24 +1,187 @@
 """Google Sheets service helper functions."""
 
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
+import hashlib
+import json
+import random
+import time
+from google.auth.transport.requests import AuthorizedSession
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+import requests
+
+
+# Base URL of the Sheets REST API, for tools that talk to the endpoints
+# directly instead of going through the discovery-based client.
+SHEETS_API_BASE = 'https://sheets.googleapis.com/v4/spreadsheets'
+
+# Credentials, services and sessions memoized per credential payload, so
+# repeated invocations skip the JSON parse, key deserialization, discovery
+# setup and TLS handshakes.
+_CREDENTIALS_CACHE: dict[str, Credentials] = {}
+_SERVICE_CACHE: dict[str, Any] = {}
+_SESSION_CACHE: dict[str, AuthorizedSession] = {}
+
+
+def _cache_key(credentials_json: Any) -> str:
+    """Compute a stable cache key for a credential payload.
+
+    Args:
+        credentials_json: The OAuth2 credentials as a JSON string or dict
+
+    Returns:
+        A short hex digest identifying the payload
+    """
+    if not isinstance(credentials_json, str):
+        credentials_json = json.dumps(credentials_json, sort_keys=True)
+    return hashlib.blake2b(credentials_json.encode(), digest_size=16).hexdigest()
+
+
+def get_credentials(credentials_json: Any) -> Credentials:
+    """Create a service account credentials object from JSON data.
+
+    Args:
+        credentials_json: The OAuth2 credentials as a JSON string or dict
+
+    Returns:
+        A google.oauth2 Credentials object (memoized per payload)
+    """
+    key = _cache_key(credentials_json)
+    credentials = _CREDENTIALS_CACHE.get(key)
+    if credentials is None:
+        if isinstance(credentials_json, str):
+            credentials_json = json.loads(credentials_json)
+        credentials = Credentials.from_service_account_info(credentials_json)
+        _CREDENTIALS_CACHE[key] = credentials
+    return credentials
 
 
 def get_sheets_service(credentials_json: Any) -> Any:
     """Create and return a Google Sheets API service object.
-    
+
     Args:
-        credentials_json: The OAuth2 credentials JSON data
-        
+        credentials_json: The OAuth2 credentials as a JSON string or dict
+
+    Returns:
+        A Google Sheets API service object (memoized per payload)
+    """
+    key = _cache_key(credentials_json)
+    service = _SERVICE_CACHE.get(key)
+    if service is None:
+        # static_discovery uses the discovery document bundled with the
+        # client library instead of fetching it over the network.
+        service = build(
+            'sheets',
+            'v4',
+            credentials=get_credentials(credentials_json),
+            cache_discovery=False,
+            static_discovery=True,
+        )
+        _SERVICE_CACHE[key] = service
+    return service
+
+
+def get_sheets_session(credentials_json: Any) -> AuthorizedSession:
+    """Create and return an authorized requests session for the Sheets API.
+
+    The session pools connections, so consecutive calls against the API
+    reuse one TCP/TLS connection instead of handshaking per request.
+
+    Args:
+        credentials_json: The OAuth2 credentials as a JSON string or dict
+
+    Returns:
+        An AuthorizedSession (memoized per payload)
+    """
+    key = _cache_key(credentials_json)
+    session = _SESSION_CACHE.get(key)
+    if session is None:
+        session = AuthorizedSession(get_credentials(credentials_json))
+        _SESSION_CACHE[key] = session
+    return session
+
+
+# Statuses worth retrying: rate limits and transient server errors
+_RETRY_STATUSES = (429, 500, 503)
+
+# Never back off longer than this many seconds per attempt
+_RETRY_MAX_DELAY = 32.0
+
+
+def _retry_details(error: Exception) -> tuple[int, float]:
+    """Extract the status code and Retry-After hint from an API error.
+
+    Args:
+        error: An HttpError or requests.HTTPError
+
+    Returns:
+        A (status_code, retry_after_seconds) tuple; status_code is 0 when
+        the error carries no response and retry_after_seconds is 0.0 when
+        the server sent no hint
+    """
+    status = 0
+    retry_after = None
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        retry_after = error.resp.get('retry-after')
+    elif isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        retry_after = error.response.headers.get('Retry-After')
+
+    try:
+        return status, float(retry_after)
+    except (TypeError, ValueError):
+        # Absent or non-numeric (HTTP-date) Retry-After
+        return status, 0.0
+
+
+def execute_with_retry(call: Callable[[], Any], max_tries: int = 5) -> Any:
+    """Execute an API call, retrying transient failures with backoff.
+
+    Rate limits (429) and transient server errors (500/503) are retried
+    with jittered exponential backoff, honoring the Retry-After header
+    when the server provides one. Other errors propagate immediately.
+
+    Args:
+        call: Zero-argument callable performing one API call
+        max_tries: Total number of attempts before giving up
+
     Returns:
-        A Google Sheets API service object
+        The call's result
     """
-    # Create credentials object from the JSON data
-    credentials = Credentials.from_service_account_info(credentials_json)
-    # Create and return the service
-    return build('sheets', 'v4', credentials=credentials)
+    for attempt in range(max_tries):
+        try:
+            return call()
+        except (HttpError, requests.HTTPError) as error:
+            status, retry_after = _retry_details(error)
+            if status not in _RETRY_STATUSES or attempt == max_tries - 1:
+                raise
+            delay = min(2 ** attempt + random.random(), _RETRY_MAX_DELAY)
+            time.sleep(max(delay, retry_after))
+
+
+def execute_concurrently(calls: list[Callable[[], Any]], max_workers: int = 8) -> list:
+    """Execute independent API calls concurrently.
+
+    Args:
+        calls: Zero-argument callables, each performing one API call
+        max_workers: Upper bound on the thread pool size
+
+    Returns:
+        The results, in the same order as the calls
+    """
+    if not calls:
+        return []
+
+    # A single call doesn't need a pool
+    if len(calls) == 1:
+        return [calls[0]()]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(calls))) as executor:
+        return list(executor.map(lambda call: call(), calls))
 
 
 def handle_google_api_error(error: Exception) -> str:
@@ -33,7 +196,14 @@ def handle_google_api_error(error: Exception) -> str:
     if isinstance(error, HttpError):
         status_code = error.resp.status
         reason = error.resp.reason
-        
+    elif isinstance(error, requests.HTTPError) and error.response is not None:
+        status_code = error.response.status_code
+        reason = error.response.reason
+    else:
+        status_code = None
+        reason = None
+
+    if status_code is not None:
         if status_code == 404:
             return "Spreadsheet not found. Check the spreadsheet ID and make sure it's shared with the service account."
         elif status_code == 403: